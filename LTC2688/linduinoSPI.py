@@ -9,10 +9,14 @@
 # Use of the software is subject to the terms and conditions of the
 # Clear BSD License ( https://spdx.org/licenses/BSD-3-Clause-Clear.html ).
 ###
-import serial
+import os
 import string
+import sys
 from serial.tools import list_ports as ports
-import time
+
+#Shared transport layer lives in the SerialTransport folder of this repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'SerialTransport'))
+from serialTransport import serialTransport, SerialProtocolError
 
 class linduinoSPI:
     '''
@@ -22,13 +26,14 @@ class linduinoSPI:
                   cleared when finished to correctly close out the serial port
     '''
     #Initializes the class instance
-    def __init__(self, explicitPort = None):
+    def __init__(self, explicitPort = None, retry = None):
         '''
         Class constructors.  Automatically searches for a Linduino devices among
         all of the comm ports.  If explicitPort is passed, only that port will
         be checked
 
         explicitPort - Force a specific COM port
+        retry - retryPolicy for transactions. Default is no retries
         '''
         self.__portConn = None
 
@@ -38,14 +43,18 @@ class linduinoSPI:
             availPorts = [explicitPort]
 
         for port in availPorts:
+            s = None
             try:
-                s = serial.Serial(port, 115200, timeout=1.0)
-                time.sleep(2)
-                s.read_all()
-                s.write(b'i')
-                id_str = s.readline()
+                s = serialTransport(port, 115200, retry=retry)
+
+                #The Linduino resets when the port is opened. Rather than a
+                #fixed wait, poll with the ID command until it responds
+                id_str = s.waitReady(b'i', lambda line: (len(line) > 24) and (line[20:25] == b'DC590'),
+                                     timeout=3.0)
 
-                if((len(id_str) > 24) and (id_str[20:25] == b'DC590')):
+                if id_str is not None:
+                    #Toss any late replies to the earlier polls
+                    s.drain()
                     self.__portConn = s
                     print('Port {} appears to be a DC590 or Linduino'.format(s.name))
                     return
@@ -53,6 +62,8 @@ class linduinoSPI:
                     s.close()
             except:
                 print('Error working with {}'.format(port))
+                if s is not None:
+                    s.close()
 
         print('Did not find a DC590 or Linduino')
 
@@ -74,6 +85,17 @@ class linduinoSPI:
         return (not self.__portConn is None)
 
 
+    #Gets the latency statistics of the port
+    def getLatencyStats(self):
+        '''
+        Returns the transaction latency statistics of the COM port
+
+        Outputs
+            Dictionary of counts and latencies in seconds. See latencyStats
+        '''
+        return self.__portConn.stats.summary()
+
+
     def writeRead(self, data):
         '''
         writeRead - Performs a SPI write and read operation. The data passed in
@@ -84,6 +106,9 @@ class linduinoSPI:
 
          Outputs
            array of bytes received. Same length as data input
+
+         Raises SerialTimeoutError if the reply doesn't arrive in time, or
+         SerialProtocolError if it is too short
         '''
         retDat = [0]*len(data)
         ctrlStr = b'x'  #CS Low
@@ -92,17 +117,29 @@ class linduinoSPI:
             ctrlStr += 'T{:02X}'.format(byte).encode()
 
         ctrlStr += b'XZ' #CS High and a new line
-        self.__portConn.write(ctrlStr)
+
+        return self.__portConn.transaction(lambda: self.__transact(ctrlStr, len(data)))
+
+
+    def __transact(self, ctrlStr, count):
+        '''
+        __transact - Single attempt at a writeRead transaction
+
+         Inputs
+           ctrlStr - Encoded command string
+           count - Number of bytes in the transaction
+        '''
+        #Reply is 2 hex digits per byte, then the new line
+        deadline = self.__portConn.write(ctrlStr, 2*count + 2)
 
         #The Linduino sometimes puts escape characters (\x) in front of data and
         #python has a hard time handling it.  Simple generator to strip out non
         #hex digits
-        resultBytes = self.__portConn.readline().decode()
+        resultBytes = self.__portConn.readLine(deadline).decode('utf-8', 'ignore')
         resultStr = ''.join(b for b in resultBytes if b in string.hexdigits)
 
-        if(len(resultStr) < (2*len(data))):
-            print('Length mismatch on read: {} {}'.format(len(resultStr),2*len(data)))
-            return None
+        if(len(resultStr) < (2*count)):
+            raise SerialProtocolError('Length mismatch on read: {} {}'.format(len(resultStr),2*count))
         else:
             bytes = bytearray.fromhex(resultStr)
             return list(bytes)
@@ -10,9 +10,20 @@
 # Clear BSD License ( https://spdx.org/licenses/BSD-3-Clause-Clear.html ).
 ###
 import argparse
+import contextlib
+import cProfile
 import datetime
 import glob
+import json
 import os
+import stat
+import time
+
+#Optional, for watch mode on Linux. Falls back to polling if not installed
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
 
 ####################################
 # This script is a helper for generating the FS nodes for flash memory when
@@ -21,6 +32,9 @@ import os
 # to Python.
 ####################################
 
+#LWIP Server information
+HDR_SERVER = 'Server: lwIP/2.2.0 (http://savannah.nongnu.org/projects/lwip)'
+
 #Constants for HTTP content types. Add as necessary
 HDR_HTML  = 'Content-type: text/html'
 HDR_CSS   = 'Content-type: text/css'
@@ -59,11 +73,96 @@ def BytesToC_Data(dataBytes: bytes, prefixIndStr: str = '', maxPerRow: int = 16)
     return outStr
 
 
+def StringToC(text: str):
+    '''
+    StringToC - Converts a string into a C string literal, escaping as needed
+
+        Inputs
+        text - String to convert
+
+        Outputs
+        String of the C literal, including the quotes
+    '''
+    escapes = { '\\': '\\\\', '"': '\\"', '\r': '\\r', '\n': '\\n' }
+    return '"' + ''.join(escapes.get(c, c) for c in text) + '"'
+
+
+class HeaderEngine:
+    '''
+    Class for generating the full HTTP response headers at build time. The
+    options are fixed at creation and applied to every file
+    '''
+    def __init__(self, http11: bool = False, contentLength: bool = False,
+                 cacheControl: str = None):
+        '''
+        __init__ Class constructor. Sets up the header options
+
+        Inputs
+        http11 - Generate HTTP/1.1 headers. Implies contentLength
+        contentLength - Include a Content-Length line
+        cacheControl - Value for a Cache-Control line. None to exclude
+        '''
+        self.http11 = http11
+        #Persistent connections need the length up front
+        self.contentLength = contentLength or http11
+        self.cacheControl = cacheControl
+
+        #The original output used bare newlines, so keep those for HTTP/1.0
+        self.lineEnd = '\r\n' if http11 else '\n'
+
+    def build(self, fname: str, ext: str, contentLen: int, isSsi: bool,
+              encoding: str = None):
+        '''
+        build - Generates the header for a single file
+
+        Inputs
+        fname - File name, without the path
+        ext - File extension used for the content type
+        contentLen - Length of the file content in bytes
+        isSsi - Flag is SSI capable file. The length is only known at runtime
+        encoding - Value for a Content-Encoding line. None to exclude
+
+        Outputs
+        Tuple of the header prefix, which excludes Content-Length and the
+        terminating blank line, and the full header
+        '''
+        version = 'HTTP/1.1' if self.http11 else 'HTTP/1.0'
+
+        #There is a special case for 404.html.  A bit dumb here, as you could
+        #have an image starting with 404. Should be ok in a custom embedded
+        #system
+        if(fname.startswith('404')):
+            lines = [version + ' 404 File not found']
+        else: #Normal HTTP OK
+            lines = [version + ' 200 OK']
+
+        lines.append(HDR_SERVER)
+
+        #Grab the type from the dictionary, otherwise assume just plain text
+        lines.append(EXT_TO_HDR.get(ext, HDR_PLAIN))
+
+        if encoding is not None:
+            lines.append('Content-Encoding: ' + encoding)
+        if self.cacheControl is not None:
+            lines.append('Cache-Control: ' + self.cacheControl)
+
+        prefix = ''.join(line + self.lineEnd for line in lines)
+
+        header = prefix
+        if self.contentLength and not isSsi:
+            header += 'Content-Length: {:d}'.format(contentLen) + self.lineEnd
+        header += self.lineEnd
+
+        return prefix, header
+
+
 class FS_Data:
     '''
     Class for holding information on a data node.  Minimal function
     '''
-    def __init__(self, path: str, header: str, content: bytes, isSsi: bool):
+    def __init__(self, path: str, header: str, content: bytes, isSsi: bool,
+                 hdrPrefix: str = None, http11: bool = False,
+                 hasContentLength: bool = False):
         '''
         __init__ Class constructor. Sets up the data elements
 
@@ -72,6 +171,9 @@ class FS_Data:
         header - Fixed header for responses
         content - Bytes for the file data
         isSsi - Flag is SSI capable file
+        hdrPrefix - Header up to, not including, Content-Length
+        http11 - Flag header is HTTP/1.1
+        hasContentLength - Flag header has a Content-Length line
         '''
         #Fix in case working in Windows
         self.path = path.replace('\\','/')
@@ -85,18 +187,305 @@ class FS_Data:
         self.header = header
         self.content = content
         self.isSsi = isSsi
+        self.hdrPrefix = header if hdrPrefix is None else hdrPrefix
+        self.http11 = http11
+        self.hasContentLength = hasContentLength
 
+        #Cleared when the header is held in the shared header table
+        self.headerIncluded = True
 
-# Application entry point.
-# Optional argument is the path location for all the web files. If not provided
-# will assume ./fs
-if __name__ == '__main__':
-    #Define the command line arguments
-    argParser = argparse.ArgumentParser()
-    argParser.add_argument("-i", "--input", help="Input path location for the web files", default='./fs/')
-    argParser.add_argument("-o", "--output", help="Output file name", default='fsdata.c')
-    args = argParser.parse_args()
-    path = args.input
+        #Generated data array, cached so watch mode only encodes changes
+        self.cData = None
+
+    def flagsToC(self):
+        '''
+        flagsToC - Generates the fsdata_file flags for this node
+
+        Outputs
+        String of C code
+        '''
+        flags = []
+        if self.headerIncluded:
+            flags.append('FS_FILE_FLAGS_HEADER_INCLUDED')
+            #Without a length the connection must close to end the response
+            if self.hasContentLength:
+                flags.append('FS_FILE_FLAGS_HEADER_PERSISTENT')
+        #Kept with the header table too, so a header hook knows the version
+        if self.http11:
+            flags.append('FS_FILE_FLAGS_HEADER_HTTPVER_1_1')
+        if self.isSsi:
+            flags.append('FS_FILE_FLAGS_SSI')
+        return ' | '.join(flags) if flags else '0'
+
+
+class BuildProfiler:
+    '''
+    Class for collecting per file timing and size statistics of a run, with
+    optional cProfile capture around the hot stages. Does nothing when
+    disabled
+    '''
+    def __init__(self, enabled: bool = False, cprofileName: str = None):
+        '''
+        __init__ Class constructor. Sets up the statistics
+
+        Inputs
+        enabled - Flag to collect statistics
+        cprofileName - File to dump cProfile stats of the stages to. None to
+                       disable cProfile
+        '''
+        self.enabled = enabled or (cprofileName is not None)
+        self.cprofileName = cprofileName
+        self.__cprof = None if cprofileName is None else cProfile.Profile()
+        self.files = {}
+        self.stages = {}
+
+    def addTime(self, path: str, key: str, seconds: float):
+        '''
+        addTime - Adds time to a per file statistic
+
+        Inputs
+        path - File path the time belongs to
+        key - Statistic to add to. read_s, encode_s or write_s
+        seconds - Time to add
+        '''
+        if self.enabled:
+            self.__getFile(path)[key] += seconds
+
+    def addBytes(self, path: str, inBytes: int = 0, outBytes: int = 0):
+        '''
+        addBytes - Adds to the input and output byte counts of a file
+
+        Inputs
+        path - File path the bytes belong to
+        inBytes - Bytes read from the input file
+        outBytes - Bytes generated in the output
+        '''
+        if self.enabled:
+            stats = self.__getFile(path)
+            stats['in_bytes'] += inBytes
+            stats['out_bytes'] += outBytes
+
+    @contextlib.contextmanager
+    def time(self, path: str, key: str):
+        '''
+        time - Context manager adding the time spent within to a per file
+               statistic
+
+        Inputs
+        path - File path the time belongs to
+        key - Statistic to add to. read_s, encode_s or write_s
+        '''
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTime(path, key, time.perf_counter() - start)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        '''
+        stage - Context manager timing a stage of the run. The stage is also
+                captured by cProfile when enabled
+
+        Inputs
+        name - Name of the stage
+        '''
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        if self.__cprof is not None:
+            self.__cprof.enable()
+        try:
+            yield
+        finally:
+            if self.__cprof is not None:
+                self.__cprof.disable()
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def report(self):
+        '''
+        report - Builds the report of all the statistics collected
+
+        Outputs
+        Dictionary of the per file statistics, stage times and totals
+        '''
+        files = []
+        totals = {'files': len(self.files), 'read_s': 0.0, 'encode_s': 0.0,
+                  'write_s': 0.0, 'in_bytes': 0, 'out_bytes': 0}
+        for path, stats in self.files.items():
+            files.append(dict(path=path, **stats, ratio=self.__ratio(stats)))
+            for key in stats:
+                totals[key] += stats[key]
+        totals['ratio'] = self.__ratio(totals)
+        return {'files': files, 'stages': dict(self.stages), 'totals': totals}
+
+    def writeJson(self, fname: str):
+        '''
+        writeJson - Writes the report to a JSON file
+
+        Inputs
+        fname - Output JSON file name
+        '''
+        with open(fname, 'w') as outF:
+            json.dump(self.report(), outF, indent=2)
+
+    def writeCProfile(self):
+        '''
+        writeCProfile - Writes the cProfile stats, if enabled. The output can
+                        be viewed with python -m pstats
+        '''
+        if self.__cprof is not None:
+            self.__cprof.dump_stats(self.cprofileName)
+
+    def printSummary(self, top: int = 10):
+        '''
+        printSummary - Prints the stage times, the slowest files and totals
+
+        Inputs
+        top - Number of slowest files to print
+        '''
+        rpt = self.report()
+        fmt = '{:>9.3f} {:>9.3f} {:>9.3f} {:>10d} {:>10d} {:>6.2f}  {:s}'
+        print('Stages:', ', '.join('{:s} {:.3f}s'.format(k, v) for k, v in rpt['stages'].items()))
+        print('{:>9s} {:>9s} {:>9s} {:>10s} {:>10s} {:>6s}  {:s}'.format(
+                'read ms', 'encode ms', 'write ms', 'in B', 'out B', 'ratio', 'file'))
+        slowest = sorted(rpt['files'], key=lambda f: f['read_s'] + f['encode_s'] + f['write_s'], reverse=True)
+        for f in slowest[:top]:
+            print(fmt.format(f['read_s'] * 1e3, f['encode_s'] * 1e3, f['write_s'] * 1e3,
+                             f['in_bytes'], f['out_bytes'], f['ratio'], f['path']))
+        t = rpt['totals']
+        print(fmt.format(t['read_s'] * 1e3, t['encode_s'] * 1e3, t['write_s'] * 1e3,
+                         t['in_bytes'], t['out_bytes'], t['ratio'],
+                         'Total of {:d} files'.format(t['files'])))
+
+    def __getFile(self, path: str):
+        return self.files.setdefault(path, {'read_s': 0.0, 'encode_s': 0.0, 'write_s': 0.0,
+                                            'in_bytes': 0, 'out_bytes': 0})
+
+    @staticmethod
+    def __ratio(stats: dict):
+        #Output to input size. Expansion for C text, compression for gzip
+        return (stats['out_bytes'] / stats['in_bytes']) if stats['in_bytes'] else 0.0
+
+
+class ProgressPrinter:
+    '''
+    Class for printing progress lines, limited to one per interval so the
+    printing doesn't slow down large runs
+    '''
+    def __init__(self, interval: float = 0.0):
+        '''
+        __init__ Class constructor
+
+        Inputs
+        interval - Minimum seconds between printed lines. 0 prints every line
+        '''
+        self.interval = interval
+        self.skipped = 0
+        self.__last = None
+
+    def update(self, *msg):
+        '''
+        update - Prints the message if the interval has passed since the last
+                 printed line. Otherwise it is counted as skipped
+
+        Inputs
+        msg - Message arguments, as passed to print
+        '''
+        now = time.monotonic()
+        if (self.__last is None) or ((now - self.__last) >= self.interval):
+            print(*msg)
+            self.__last = now
+        else:
+            self.skipped += 1
+
+    def finish(self):
+        '''
+        finish - Prints how many lines were skipped, if any, and resets
+        '''
+        if self.skipped:
+            print('({:d} more not shown)'.format(self.skipped))
+        self.skipped = 0
+        self.__last = None
+
+
+def LoadFsFile(file: str, path: str, hdrEngine: HeaderEngine, gzip: bool = False,
+               profiler: BuildProfiler = None):
+    '''
+    LoadFsFile - Reads a single file and builds its FS_Data node
+
+        Inputs
+        file - File to read, as found by the scan
+        path - Input path location for the web files
+        hdrEngine - HeaderEngine used to generate the headers
+        gzip - Serve .gz files under the uncompressed name, with a gzip
+               Content-Encoding
+        profiler - BuildProfiler to record the read statistics in
+
+        Outputs
+        FS_Data instance for the file
+    '''
+    if profiler is None:
+        profiler = BuildProfiler()
+
+    #Assume not SSI or encoded
+    isSsi = False
+    encoding = None
+
+    #Grab the actual file data as bytes
+    readStart = time.perf_counter()
+    with open(file, 'rb') as inF:
+        content = inF.read()
+    readTime = time.perf_counter() - readStart
+
+    #Clean up for Window's slashes
+    file = file.replace('\\', '/')
+
+    #Pre-compressed files are served under the uncompressed name
+    if gzip and file.endswith('.gz'):
+        file = file.removesuffix('.gz')
+        encoding = 'gzip'
+
+    #Grab just the file name and extension
+    dname,fname = os.path.split(file)
+    ext = os.path.splitext(fname)[1]
+
+    #Check if an SSI file
+    if ext in SSI_EXTS:
+        isSsi  = True
+
+    hdrPrefix, header = hdrEngine.build(fname, ext, len(content), isSsi, encoding)
+
+    #Ditch the path from the start of file
+    fsd = FS_Data(file.removeprefix(path), header, content, isSsi,
+                  hdrPrefix, hdrEngine.http11, hdrEngine.contentLength and not isSsi)
+    profiler.addTime(fsd.path, 'read_s', readTime)
+    profiler.addBytes(fsd.path, inBytes=len(content))
+    return fsd
+
+
+def GetFsData(path: str, hdrEngine: HeaderEngine, gzip: bool = False,
+              profiler: BuildProfiler = None, progress: ProgressPrinter = None):
+    '''
+    GetFsData - Recursively scans the input path and builds the FS_Data nodes
+                for every file found
+        Inputs
+        path - Input path location for the web files
+        hdrEngine - HeaderEngine used to generate the headers
+        gzip - Serve .gz files under the uncompressed name, with a gzip
+               Content-Encoding
+        profiler - BuildProfiler to record the read statistics in
+        progress - ProgressPrinter for the per file progress
+
+        Outputs
+        List of FS_Data instances, in scan order
+    '''
+    if progress is None:
+        progress = ProgressPrinter()
 
     #Recursively grab all the files
     dataFiles = glob.glob(path + '/**/*.*', recursive=True)
@@ -104,101 +493,749 @@ if __name__ == '__main__':
     #Initialize the empty list
     fsData = []
 
-    print('Parsing files from:', path)
-
     #Process the files
     for file in dataFiles:
-        #Assume not SSI
-        isSsi = False
+        fsd = LoadFsFile(file, path, hdrEngine, gzip, profiler)
 
-        #Grab just the file name
-        dname,fname = os.path.split(file)
+        #Notify the user of progess
+        progress.update('Processing', fsd.path)
 
-        #There is a special case for 404.html.  A bit dumb here, as you could
-        #have an image starting with 404. Should be ok in a custom embedded
-        #system
-        if(fname.startswith('404')):
-            header = 'HTTP/1.0 404 File not found\n'
-        else: #Normal HTTP OK
-            header = 'HTTP/1.0 200 OK\n'
+        #Add a new instance to the list
+        fsData.append(fsd)
 
-        #LWIP Server information
-        header += 'Server: lwIP/2.2.0 (http://savannah.nongnu.org/projects/lwip)\n'
+    progress.finish()
+    return fsData
 
-        #Grab the file extension
-        ext = os.path.splitext(fname)[1]
 
-        #Grab the data from the dictionary
-        try:
-            header += EXT_TO_HDR[ext] + '\n\n'
-        except:
-            #Otherwise assume just plain text
-            header += HDR_PLAIN + '\n\n'
+@contextlib.contextmanager
+def AtomicWrite(fname: str, mode: str = 'w'):
+    '''
+    AtomicWrite - Context manager opening a temporary file next to fname,
+                  which replaces fname only once fully written. Readers never
+                  see a partial output
 
-        #Check if an SSI file
-        if ext in SSI_EXTS:
-            isSsi  = True
+        Inputs
+        fname - Output file name
+        mode - File open mode. 'w' or 'wb'
+    '''
+    tmpName = fname + '.tmp'
+    try:
+        with open(tmpName, mode) as outF:
+            yield outF
+        os.replace(tmpName, fname)
+    finally:
+        if os.path.exists(tmpName):
+            os.remove(tmpName)
 
-        #Grab the actual file data as bytes
-        with open(file, 'rb') as inF:
-            content = inF.read()
 
-        #Clean up for Window's slashes
-        file = file.replace('\\', '/')
+def FileHeaderToC():
+    '''
+    FileHeaderToC - Generates the autogenerated banner and common includes
+                    placed at the top of every output C file
 
-        #Notify the user of progess
-        print('Processing', file.removeprefix(path))
+        Outputs
+        String of C code
+    '''
+    return ('/**\n' +
+            ' * This file was autogenerated on ' + str(datetime.datetime.now()) + '.\n' +
+            ' * It is recommended to regenerate if changes are needed.\n' +
+            ' * Proceed with caution if manually editing\n */\n' +
+            '#include "lwip/apps/fs.h"\n' +
+            '#include "lwip/def.h"\n\n' +
+            '#define file_NULL (struct fsdata_file *) NULL\n\n')
 
-        #Add a new instance to the list. Ditch the path from the start of file
-        fsData.append( FS_Data(file.removeprefix(path), header, content, isSsi))
 
-    #Notify the user of progress
-    print('Generating output file', args.output)
-
-    #Generate the actual C file.
-    outputFile = open(args.output, 'w')
-    outputFile.write('/**\n' +
-                     ' * This file was autogenerated on ' + str(datetime.datetime.now()) + '.\n' +
-                     ' * It is recommended to regenerate if changes are needed.\n' +
-                     ' * Proceed with caution if manually editing\n */\n')
-    outputFile.write(('#include "lwip/apps/fs.h"\n' +
-                      '#include "lwip/def.h"\n\n' +
-                      '#define file_NULL (struct fsdata_file *) NULL\n\n' +
-                      '#ifndef FSDATA_ALIGN_PRE\n' +
-                      '#define FSDATA_ALIGN_PRE\n' +
-                      '#endif\n' +
-                      '#ifndef FSDATA_ALIGN_POST\n' +
-                      '#define FSDATA_ALIGN_POST\n' +
-                      '#endif\n\n\n'))
-
-    #Generate the code for the raw data
-    for fsd in fsData:
-        outputFile.write('#define {:s}_name "{:s}"\n'.format(fsd.prefix, fsd.path))
-        outputFile.write('static const unsigned char FSDATA_ALIGN_PRE {:s}_data[] FSDATA_ALIGN_POST = {{\n'.format(fsd.prefix))
-        outputFile.write('/*\n{:s}*/\n'.format(fsd.header))
-        outputFile.write(BytesToC_Data(fsd.header.encode('utf-8'),'    ', 16))
-        outputFile.write('\n/* Data */\n')
-        outputFile.write(BytesToC_Data(fsd.content, '    ', 16))
-        outputFile.write('};\n\n')
+def DataArrayToC(fsd: FS_Data):
+    '''
+    DataArrayToC - Generates the name define and the data array holding the
+                   header and content bytes for a single node
+
+        Inputs
+        fsd - FS_Data node to convert
+
+        Outputs
+        String of C code
+    '''
+    return ('#define {:s}_name "{:s}"\n'.format(fsd.prefix, fsd.path) +
+            'static const unsigned char FSDATA_ALIGN_PRE {:s}_data[] FSDATA_ALIGN_POST = {{\n'.format(fsd.prefix) +
+            ('/*\n{:s}*/\n'.format(fsd.header.replace('\r', '')) if fsd.header else '') +
+            BytesToC_Data(fsd.header.encode('utf-8'),'    ', 16) +
+            '\n/* Data */\n' +
+            BytesToC_Data(fsd.content, '    ', 16) +
+            '};\n\n')
 
-    #Just a file separator
-    outputFile.write('/******************************************/\n\n')
 
+def FileStructToC(fsd: FS_Data, nextNode: str, dataExpr: str):
+    '''
+    FileStructToC - Generates the fsdata_file struct for a single node
+
+        Inputs
+        fsd - FS_Data node to convert
+        nextNode - Name of the next node in the linked list
+        dataExpr - C expression for the pointer to the header and content
+
+        Outputs
+        String of C code
+    '''
+    outStr = ('const struct fsdata_file file_{:s}[] = {{{{\n'.format(fsd.prefix) +
+              '    {:s},\n'.format(nextNode) +
+              '    (unsigned char*){:s}_name,\n'.format(fsd.prefix) +
+              '    {:s},\n'.format(dataExpr) +
+              '    {:d},\n'.format(len(fsd.header) + len(fsd.content)) +
+              '    {:s},\n'.format(fsd.flagsToC()) +
+              '}};\n\n')
+    return outStr
+
+
+def FileListToC(fsData: list, dataExprFmt: str):
+    '''
+    FileListToC - Generates the linked list of fsdata_file structs along with
+                  the FS_ROOT and FS_NUMFILES defines
+
+        Inputs
+        fsData - List of FS_Data nodes
+        dataExprFmt - Format string for the data pointer. {0} is the prefix
+
+        Outputs
+        String of C code
+    '''
     #Create the structs and linked list. Generated tail first, so next is NULL
+    structs = []
     nextNode = 'file_NULL'
     for fsd in fsData:
-        outputFile.write('const struct fsdata_file file_{:s}[] = {{{{\n'.format(fsd.prefix))
-        outputFile.write('    {:s},\n'.format(nextNode))
-        outputFile.write('    (unsigned char*){:s}_name,\n'.format(fsd.prefix))
-        outputFile.write('    {:s}_data,\n'.format(fsd.prefix))
-        outputFile.write('    {:d},\n'.format(len(fsd.header) + len(fsd.content)))
-        if fsd.isSsi:
-            outputFile.write('    FS_FILE_FLAGS_HEADER_INCLUDED | FS_FILE_FLAGS_HEADER_PERSISTENT | FS_FILE_FLAGS_SSI,\n')
-        else:
-            outputFile.write('    FS_FILE_FLAGS_HEADER_INCLUDED | FS_FILE_FLAGS_HEADER_PERSISTENT,\n')
-        outputFile.write('}};\n\n')
+        structs.append(FileStructToC(fsd, nextNode, dataExprFmt.format(fsd.prefix)))
         nextNode = 'file_' + fsd.prefix
 
-    outputFile.write('#define FS_ROOT {:s}\n'.format(nextNode))
-    outputFile.write('#define FS_NUMFILES {:d}\n'.format(len(fsData)))
-    outputFile.close()
+    structs.append('#define FS_ROOT {:s}\n'.format(nextNode))
+    structs.append('#define FS_NUMFILES {:d}\n'.format(len(fsData)))
+    return ''.join(structs)
+
+
+def BuildHeaderTable(fsData: list):
+    '''
+    BuildHeaderTable - Moves the headers out of the file data and into a table
+                       of shared prefixes. Identical prefixes are stored once
+
+        Inputs
+        fsData - List of FS_Data nodes. Headers are removed from each node
+
+        Outputs
+        Tuple of the list of unique prefixes and a list of prefix indices, one
+        per node
+    '''
+    prefixes = {}
+    indices = []
+    for fsd in fsData:
+        indices.append(prefixes.setdefault(fsd.hdrPrefix, len(prefixes)))
+        fsd.header = ''
+        fsd.headerIncluded = False
+    return list(prefixes), indices
+
+
+def HeaderTableToC(fsData: list, prefixes: list, indices: list, lineEnd: str,
+                   contentLength: bool):
+    '''
+    HeaderTableToC - Generates the shared header prefix strings and the per
+                     file index into them. A response header is the prefix,
+                     then FSDATA_HDR_LENGTH_FMT filled with content_len if
+                     defined, otherwise just the blank line
+
+        Inputs
+        fsData - List of FS_Data nodes
+        prefixes - List of unique header prefixes
+        indices - List of prefix indices, one per node
+        lineEnd - Line ending used by the headers
+        contentLength - Flag headers include a Content-Length line
+
+        Outputs
+        String of C code
+    '''
+    outStr = '\n/******************************************/\n\n'
+    #Format must match the u32_t content_len on every port
+    if contentLength:
+        outStr += '#define FSDATA_HDR_LENGTH_FMT "Content-Length: %" U32_F {:s}\n\n'.format(
+                        StringToC(lineEnd + lineEnd))
+    for i, prefix in enumerate(prefixes):
+        outStr += 'static const char fsdata_hdr_{:d}[] = {:s};\n'.format(i, StringToC(prefix))
+
+    #content_len is 0 for SSI files, as the length is only known at runtime.
+    #Check FS_FILE_FLAGS_SSI, not content_len, as a file may be empty
+    outStr += ('\nstruct fsdata_hdr {\n' +
+               '    const struct fsdata_file *file;\n' +
+               '    const char *prefix;\n' +
+               '    u16_t prefix_len;\n' +
+               '    u32_t content_len;\n' +
+               '};\n\n')
+
+    #Zero length arrays aren't valid C, so there is no index without files
+    if fsData:
+        outStr += 'const struct fsdata_hdr fsdata_hdr_index[] = {\n'
+        for fsd, index in zip(fsData, indices):
+            outStr += '    {{ file_{:s}, fsdata_hdr_{:d}, sizeof(fsdata_hdr_{:d}) - 1, {:d} }},\n'.format(
+                        fsd.prefix, index, index, 0 if fsd.isSsi else len(fsd.content))
+        outStr += '};\n\n'
+    outStr += '#define FSDATA_HDR_NUM_PREFIXES {:d}\n'.format(len(prefixes))
+    return outStr
+
+
+#Number of hash seeds tried before falling back to a sorted lookup table
+HASH_SEED_TRIES = 16
+
+
+def Fnv1a32(data: bytes, seed: int = 0):
+    '''
+    Fnv1a32 - 32-bit FNV-1a hash. Must match fsdata_hash in the generated C
+
+        Inputs
+        data - Bytes to hash
+        seed - Value XORed into the offset basis, to pick a different hash
+
+        Outputs
+        32-bit hash value
+    '''
+    h = 0x811c9dc5 ^ seed
+    for b in data:
+        h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+
+def Mix32(h: int):
+    '''
+    Mix32 - 32-bit integer finalizer for spreading a displaced hash over the
+            table. Must match fsdata_mix in the generated C
+
+        Inputs
+        h - 32-bit value to mix
+
+        Outputs
+        32-bit mixed value
+    '''
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & 0xFFFFFFFF
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & 0xFFFFFFFF
+    h ^= h >> 16
+    return h
+
+
+def BuildPerfectHash(fsData: list):
+    '''
+    BuildPerfectHash - Builds a hash and displace perfect hash of the file
+                       names. A name hashes to a bucket with h % buckets, and
+                       its slot is Mix32(h ^ disp[bucket]) & (slots - 1), so a
+                       lookup is a single probe and strcmp
+
+        Inputs
+        fsData - List of FS_Data nodes
+
+        Outputs
+        Tuple of the hash seed, the displacement list, one per bucket, and the
+        slot list holding an FS_Data node or None. None if the names collide
+        in the 32-bit hash with every seed tried
+    '''
+    #Two names with the same hash can't be told apart. Try other seeds
+    for i in range(HASH_SEED_TRIES):
+        seed = (i * 0x9e3779b9) & 0xFFFFFFFF
+        hashes = [Fnv1a32(fsd.path.encode('utf-8'), seed) for fsd in fsData]
+        if len(set(hashes)) == len(hashes):
+            break
+    else:
+        return None
+
+    numBuckets = max(1, (len(fsData) + 1) // 2)
+    numSlots = 1
+    while numSlots < len(fsData):
+        numSlots <<= 1
+
+    buckets = [[] for i in range(numBuckets)]
+    for fsd, h in zip(fsData, hashes):
+        buckets[h % numBuckets].append((fsd, h))
+
+    #Place the largest buckets first, while the table is mostly empty. If a
+    #bucket can't be placed, double the table and start over
+    order = sorted(range(numBuckets), key=lambda b: len(buckets[b]), reverse=True)
+    while True:
+        disp = [0] * numBuckets
+        slots = [None] * numSlots
+        for b in order:
+            if not buckets[b]:
+                continue
+            for d in range(0x10000):
+                idx = [Mix32(h ^ d) & (numSlots - 1) for fsd, h in buckets[b]]
+                if len(set(idx)) == len(idx) and all(slots[i] is None for i in idx):
+                    break
+            else:
+                break
+            disp[b] = d
+            for i, (fsd, h) in zip(idx, buckets[b]):
+                slots[i] = fsd
+        else:
+            return seed, disp, slots
+        numSlots <<= 1
+
+
+def LookupTableToC(fsData: list, mode: str):
+    '''
+    LookupTableToC - Generates a lookup table of the file names, along with an
+                     fsdata_find_file function usable from an fs_open hook.
+                     The linked list is left intact
+
+        Inputs
+        fsData - List of FS_Data nodes
+        mode - 'hash' for a perfect hash, 'sorted' for a binary search table
+
+        Outputs
+        String of C code
+    '''
+    outStr = '\n/******************************************/\n\n#include <string.h>\n\n'
+    perfectHash = None
+    if fsData and (mode == 'hash'):
+        perfectHash = BuildPerfectHash(fsData)
+        if perfectHash is None:
+            print('Warning: file names collide in the lookup hash, using a sorted table instead')
+            mode = 'sorted'
+
+    if not fsData:
+        #Zero length arrays aren't valid C, so there is nothing to look up
+        outStr += ('const struct fsdata_file *fsdata_find_file(const char *name)\n' +
+                   '{\n' +
+                   '    (void)name;\n' +
+                   '    return NULL;\n' +
+                   '}\n')
+    elif mode == 'sorted':
+        #strcmp order is unsigned byte order
+        sortedData = sorted(fsData, key=lambda fsd: fsd.path.encode('utf-8'))
+        outStr += 'static const struct fsdata_file *const fsdata_sorted[] = {\n'
+        for fsd in sortedData:
+            outStr += '    file_{:s},\n'.format(fsd.prefix)
+        outStr += ('};\n\n' +
+                   'const struct fsdata_file *fsdata_find_file(const char *name)\n' +
+                   '{\n' +
+                   '    int lo = 0;\n' +
+                   '    int hi = FS_NUMFILES - 1;\n' +
+                   '    while (lo <= hi) {\n' +
+                   '        int mid = lo + (hi - lo) / 2;\n' +
+                   '        int cmp = strcmp(name, (const char *)fsdata_sorted[mid]->name);\n' +
+                   '        if (cmp == 0) {\n' +
+                   '            return fsdata_sorted[mid];\n' +
+                   '        } else if (cmp < 0) {\n' +
+                   '            hi = mid - 1;\n' +
+                   '        } else {\n' +
+                   '            lo = mid + 1;\n' +
+                   '        }\n' +
+                   '    }\n' +
+                   '    return NULL;\n' +
+                   '}\n')
+    else:
+        seed, disp, slots = perfectHash
+        outStr += '#define FSDATA_HASH_SEED 0x{:08x}UL\n'.format(seed)
+        outStr += '#define FSDATA_HASH_BUCKETS {:d}\n'.format(len(disp))
+        outStr += '#define FSDATA_HASH_SLOTS {:d}\n\n'.format(len(slots))
+        outStr += 'static const u16_t fsdata_hash_disp[FSDATA_HASH_BUCKETS] = {\n'
+        for i in range(0, len(disp), 8):
+            outStr += '    ' + ''.join('0x{:04x}, '.format(d) for d in disp[i:i+8]) + '\n'
+        outStr += '};\n\n'
+        outStr += 'static const struct fsdata_file *const fsdata_hash_slots[FSDATA_HASH_SLOTS] = {\n'
+        for fsd in slots:
+            outStr += '    {:s},\n'.format('file_NULL' if fsd is None else 'file_' + fsd.prefix)
+        outStr += ('};\n\n' +
+                   'static u32_t fsdata_hash(const char *name)\n' +
+                   '{\n' +
+                   '    u32_t h = 0x811c9dc5UL ^ FSDATA_HASH_SEED;\n' +
+                   '    while (*name) {\n' +
+                   '        h = (h ^ (unsigned char)*name++) * 0x01000193UL;\n' +
+                   '    }\n' +
+                   '    return h & 0xFFFFFFFFUL;\n' +
+                   '}\n\n' +
+                   'static u32_t fsdata_mix(u32_t h)\n' +
+                   '{\n' +
+                   '    h ^= h >> 16;\n' +
+                   '    h = (h * 0x85ebca6bUL) & 0xFFFFFFFFUL;\n' +
+                   '    h ^= h >> 13;\n' +
+                   '    h = (h * 0xc2b2ae35UL) & 0xFFFFFFFFUL;\n' +
+                   '    h ^= h >> 16;\n' +
+                   '    return h;\n' +
+                   '}\n\n' +
+                   'const struct fsdata_file *fsdata_find_file(const char *name)\n' +
+                   '{\n' +
+                   '    u32_t h = fsdata_hash(name);\n' +
+                   '    const struct fsdata_file *f = fsdata_hash_slots[\n' +
+                   '        fsdata_mix(h ^ fsdata_hash_disp[h % FSDATA_HASH_BUCKETS]) & (FSDATA_HASH_SLOTS - 1)];\n' +
+                   '    if ((f != NULL) && (strcmp(name, (const char *)f->name) == 0)) {\n' +
+                   '        return f;\n' +
+                   '    }\n' +
+                   '    return NULL;\n' +
+                   '}\n')
+    return outStr
+
+
+def WriteCFile(outName: str, fsData: list, tailC: str = '',
+               profiler: BuildProfiler = None):
+    '''
+    WriteCFile - Writes the standard C file with all of the file data held in
+                 C arrays
+
+        Inputs
+        outName - Output C file name
+        fsData - List of FS_Data nodes
+        tailC - Additional C code to place after the linked list
+        profiler - BuildProfiler to record the encode and write statistics in
+    '''
+    if profiler is None:
+        profiler = BuildProfiler()
+
+    with AtomicWrite(outName, 'w') as outputFile:
+        outputFile.write(FileHeaderToC())
+        outputFile.write(('#ifndef FSDATA_ALIGN_PRE\n' +
+                          '#define FSDATA_ALIGN_PRE\n' +
+                          '#endif\n' +
+                          '#ifndef FSDATA_ALIGN_POST\n' +
+                          '#define FSDATA_ALIGN_POST\n' +
+                          '#endif\n\n\n'))
+
+        #Generate the code for the raw data. Reuse it if already generated
+        for fsd in fsData:
+            with profiler.time(fsd.path, 'encode_s'):
+                if fsd.cData is None:
+                    fsd.cData = DataArrayToC(fsd)
+            with profiler.time(fsd.path, 'write_s'):
+                outputFile.write(fsd.cData)
+            profiler.addBytes(fsd.path, outBytes=len(fsd.cData))
+
+        #Just a file separator
+        outputFile.write('/******************************************/\n\n')
+
+        outputFile.write(FileListToC(fsData, '{0}_data'))
+        outputFile.write(tailC)
+
+
+def WriteBinaryImage(binName: str, fsData: list, align: int = 4,
+                     profiler: BuildProfiler = None):
+    '''
+    WriteBinaryImage - Packs the header and content of every node into a single
+                       binary image. Each node starts on an align boundary
+
+        Inputs
+        binName - Output binary image file name
+        fsData - List of FS_Data nodes
+        align - Byte alignment for the start of each node
+        profiler - BuildProfiler to record the encode and write statistics in
+
+        Outputs
+        Tuple of the image size and a list of offsets, one per node
+    '''
+    if profiler is None:
+        profiler = BuildProfiler()
+
+    size = 0
+    offsets = []
+    with AtomicWrite(binName, 'wb') as binFile:
+        for fsd in fsData:
+            with profiler.time(fsd.path, 'encode_s'):
+                #Pad up to the next boundary
+                chunk = bytes(-size % align) + fsd.header.encode('utf-8') + fsd.content
+            with profiler.time(fsd.path, 'write_s'):
+                binFile.write(chunk)
+            profiler.addBytes(fsd.path, outBytes=len(chunk))
+            offsets.append(size + (-size % align))
+            size += len(chunk)
+    return size, offsets
+
+
+def WriteBinaryFiles(outName: str, binName: str, fsData: list, align: int = 4,
+                     tailC: str = '', profiler: BuildProfiler = None):
+    '''
+    WriteBinaryFiles - Writes the packed binary image along with a small C stub
+                       holding the fsdata_file linked list pointing into it.
+                       The image is pulled in with .incbin by default, or with
+                       an objcopy generated object if FSDATA_IMAGE_OBJCOPY is
+                       defined
+
+        Inputs
+        outName - Output C stub file name
+        binName - Output binary image file name
+        fsData - List of FS_Data nodes
+        align - Byte alignment for the start of each node
+        tailC - Additional C code to place after the linked list
+        profiler - BuildProfiler to record the encode and write statistics in
+    '''
+    size, offsets = WriteBinaryImage(binName, fsData, align, profiler)
+
+    #The stub refers to the image by its base name. Symbol follows what
+    #objcopy -I binary generates when run from the image's folder
+    binBase = os.path.basename(binName)
+    objSym = '_binary_' + ''.join(c if c.isalnum() else '_' for c in binBase) + '_start'
+
+    with AtomicWrite(outName, 'w') as outputFile:
+        outputFile.write(FileHeaderToC())
+        #objcopy defaults to a writable, byte aligned .data section, which
+        #startup code would copy to RAM. Keep it read only and aligned in flash
+        outputFile.write(('/* File data is held in {0:s} ({1:d} bytes). Either:\n' +
+                          ' *  - Assemble as is. {0:s} must be on the assembler include path\n' +
+                          ' *  - Define FSDATA_IMAGE_OBJCOPY and link the output of\n' +
+                          ' *    objcopy -I binary -O <target> \\\n' +
+                          ' *      --rename-section .data=.rodata,alloc,load,readonly,data,contents \\\n' +
+                          ' *      --set-section-alignment .data={2:d} {0:s} <object>\n' +
+                          ' */\n').format(binBase, size, align))
+        outputFile.write(('#ifdef FSDATA_IMAGE_OBJCOPY\n' +
+                          'extern const unsigned char {0:s}[];\n' +
+                          '#define fsdata_image {0:s}\n' +
+                          '#else\n' +
+                          '#ifndef FSDATA_IMAGE_SECTION\n' +
+                          '#define FSDATA_IMAGE_SECTION ".rodata.fsdata_image"\n' +
+                          '#endif\n' +
+                          '__asm__(\n' +
+                          '    "    .section " FSDATA_IMAGE_SECTION ", \\"a\\"\\n"\n' +
+                          '    "    .balign {1:d}\\n"\n' +
+                          '    "    .global fsdata_image\\n"\n' +
+                          '    "fsdata_image:\\n"\n' +
+                          '    "    .incbin \\"{2:s}\\"\\n"\n' +
+                          '    "    .previous\\n"\n' +
+                          ');\n' +
+                          'extern const unsigned char fsdata_image[];\n' +
+                          '#endif\n\n\n').format(objSym, align, binBase))
+
+        #Names and the offset index into the image
+        for fsd, offset in zip(fsData, offsets):
+            outputFile.write('#define {:s}_name "{:s}"\n'.format(fsd.prefix, fsd.path))
+            outputFile.write('#define {:s}_offset 0x{:08x}\n'.format(fsd.prefix, offset))
+
+        #Just a file separator
+        outputFile.write('\n/******************************************/\n\n')
+
+        outputFile.write(FileListToC(fsData, '&fsdata_image[{0}_offset]'))
+        outputFile.write(tailC)
+
+
+def GenerateOutput(fsData: list, args: argparse.Namespace, hdrEngine: HeaderEngine,
+                   profiler: BuildProfiler = None):
+    '''
+    GenerateOutput - Generates the optional tables and writes the output files
+                     selected by the command line arguments
+
+        Inputs
+        fsData - List of FS_Data nodes
+        args - Parsed command line arguments
+        hdrEngine - HeaderEngine used to generate the headers
+        profiler - BuildProfiler to record the statistics in
+    '''
+    if profiler is None:
+        profiler = BuildProfiler()
+
+    tailC = ''
+    with profiler.stage('tables'):
+        if args.header_table:
+            prefixes, indices = BuildHeaderTable(fsData)
+            tailC += HeaderTableToC(fsData, prefixes, indices, hdrEngine.lineEnd,
+                                    hdrEngine.contentLength)
+        if args.lookup is not None:
+            tailC += LookupTableToC(fsData, args.lookup)
+
+    with profiler.stage('generate'):
+        if args.binary is None:
+            WriteCFile(args.output, fsData, tailC, profiler)
+        else:
+            WriteBinaryFiles(args.output, args.binary, fsData, args.align, tailC, profiler)
+
+
+class FsWatcher:
+    '''
+    Class for watch mode. Keeps the FS_Data nodes, and their generated C, of
+    all scanned files in memory and regenerates the output whenever files
+    change. Only the changed files are read and encoded again. Uses inotify
+    when inotify_simple is installed, otherwise polls the file stats
+    '''
+    #inotify events which may change the set of files or their contents
+    WATCH_FLAGS = ['CREATE', 'CLOSE_WRITE', 'ATTRIB', 'DELETE', 'MOVED_FROM',
+                   'MOVED_TO', 'DELETE_SELF']
+
+    def __init__(self, path: str, hdrEngine: HeaderEngine, gzip: bool, generate):
+        '''
+        __init__ Class constructor
+
+        Inputs
+        path - Input path location for the web files
+        hdrEngine - HeaderEngine used to generate the headers
+        gzip - Serve .gz files under the uncompressed name, with a gzip
+               Content-Encoding
+        generate - Function called with the list of FS_Data nodes to write
+                   the output
+        '''
+        self.path = path
+        self.hdrEngine = hdrEngine
+        self.gzip = gzip
+        self.__generate = generate
+
+        #Scanned file name to stat key and FS_Data node, in scan order
+        self.__files = {}
+
+    def run(self, pollInterval: float = 0.25, debounce: float = 0.05,
+            usePolling: bool = False):
+        '''
+        run - Builds the output, then regenerates it on every change until
+              interrupted with Ctrl+C
+
+        Inputs
+        pollInterval - Seconds between scans when polling
+        debounce - Seconds to wait for more inotify events before updating
+        usePolling - Poll even if inotify is available
+        '''
+        changed, removed = self.__scanAll()
+        self.__regenerate(changed, removed)
+
+        try:
+            if usePolling or (inotify_simple is None):
+                print('Watching', self.path, 'by polling every', pollInterval, 's. Ctrl+C to stop')
+                self.__pollLoop(pollInterval)
+            else:
+                print('Watching', self.path, 'with inotify. Ctrl+C to stop')
+                self.__inotifyLoop(debounce)
+        except KeyboardInterrupt:
+            print('Stopped watching')
+
+    def __pollLoop(self, pollInterval: float):
+        while True:
+            time.sleep(pollInterval)
+            changed, removed = self.__scanAll()
+            if changed or removed:
+                self.__regenerate(changed, removed)
+
+    def __inotifyLoop(self, debounce: float):
+        flags = inotify_simple.flags
+        mask = 0
+        for name in self.WATCH_FLAGS:
+            mask |= getattr(flags, name)
+
+        with inotify_simple.INotify() as notifier:
+            watches = self.__addWatches(notifier, mask)
+            while True:
+                events = notifier.read(timeout=1000, read_delay=int(debounce * 1000))
+                if not events:
+                    continue
+
+                #Directories added or removed are rare. Rescan it all
+                if any(e.mask & flags.ISDIR for e in events):
+                    watches = self.__addWatches(notifier, mask)
+                    changed, removed = self.__scanAll()
+                else:
+                    changed = removed = 0
+                    for d in set(watches[e.wd] for e in events if e.wd in watches):
+                        c, r = self.__scanDir(d)
+                        changed += c
+                        removed += r
+
+                if changed or removed:
+                    self.__regenerate(changed, removed)
+
+    def __addWatches(self, notifier, mask: int):
+        #Same folders as the file scan, so the names match the scanned files
+        watches = {}
+        for d in glob.glob(self.path + '/**/', recursive=True):
+            d = os.path.dirname(d)
+            try:
+                watches[notifier.add_watch(d, mask)] = d
+            except OSError:
+                pass #Removed since the glob
+        return watches
+
+    def __scanAll(self):
+        found = glob.glob(self.path + '/**/*.*', recursive=True)
+        return self.__update(found, lambda file: True)
+
+    def __scanDir(self, d: str):
+        found = glob.glob(os.path.join(glob.escape(d), '*.*'))
+        return self.__update(found, lambda file: os.path.dirname(file) == d)
+
+    def __update(self, found: list, inScope):
+        '''
+        Reloads the found files which are new or have changed, and drops the
+        known files within the scope of the scan which were not found.
+        Returns the changed and removed counts
+        '''
+        changed = 0
+        for file in found:
+            try:
+                st = os.stat(file)
+                if not stat.S_ISREG(st.st_mode):
+                    continue
+                statKey = (st.st_mtime_ns, st.st_size)
+                entry = self.__files.get(file)
+                if (entry is None) or (entry[0] != statKey):
+                    self.__files[file] = (statKey, LoadFsFile(file, self.path, self.hdrEngine, self.gzip))
+                    changed += 1
+            except OSError:
+                pass #Removed or still being written. The next event catches it
+
+        found = set(found)
+        removed = [file for file in self.__files if inScope(file) and file not in found]
+        for file in removed:
+            del self.__files[file]
+        return changed, len(removed)
+
+    def __regenerate(self, changed: int, removed: int):
+        start = time.perf_counter()
+        self.__generate([entry[1] for entry in self.__files.values()])
+        print('Regenerated {:d} files in {:.1f} ms ({:d} changed, {:d} removed)'.format(
+                len(self.__files), (time.perf_counter() - start) * 1e3, changed, removed))
+
+
+# Application entry point.
+# Optional argument is the path location for all the web files. If not provided
+# will assume ./fs
+if __name__ == '__main__':
+    #Define the command line arguments
+    argParser = argparse.ArgumentParser()
+    argParser.add_argument("-i", "--input", help="Input path location for the web files", default='./fs/')
+    argParser.add_argument("-o", "--output", help="Output file name", default='fsdata.c')
+    argParser.add_argument("-b", "--binary", help="Write the file data to this packed binary image, and only a C stub to the output file")
+    argParser.add_argument("-a", "--align", help="Byte alignment of each file in the binary image. Must be a power of 2", type=int, default=4)
+    argParser.add_argument("-1", "--http11", help="Generate HTTP/1.1 headers. Implies --content-length", action='store_true')
+    argParser.add_argument("-l", "--content-length", help="Include Content-Length in the headers", action='store_true')
+    argParser.add_argument("-c", "--cache-control", help="Value for a Cache-Control header line")
+    argParser.add_argument("-z", "--gzip", help="Serve .gz files under the uncompressed name with a gzip Content-Encoding", action='store_true')
+    argParser.add_argument("-t", "--header-table", help="Hold the headers in a shared prefix table instead of the file data", action='store_true')
+    argParser.add_argument("-k", "--lookup", help="Also generate a file name lookup table and fsdata_find_file function", choices=['hash', 'sorted'])
+    argParser.add_argument("-p", "--profile", help="Print per file timing and size statistics", action='store_true')
+    argParser.add_argument("-r", "--report", help="Write the timing and size statistics to this JSON file")
+    argParser.add_argument("--cprofile", help="Write cProfile stats of the scan and generate stages to this file")
+    argParser.add_argument("--progress-interval", help="Minimum seconds between progress lines. 0 prints every file", type=float, default=0.1)
+    argParser.add_argument("-w", "--watch", help="Keep running, and regenerate the output when the input files change", action='store_true')
+    argParser.add_argument("--poll", help="In watch mode, poll for changes even if inotify is available", action='store_true')
+    argParser.add_argument("--poll-interval", help="Seconds between scans when polling for changes", type=float, default=0.25)
+    args = argParser.parse_args()
+    path = args.input
+
+    if args.binary is not None and (args.align < 1 or (args.align & (args.align - 1))):
+        argParser.error('Alignment must be a power of 2')
+
+    hdrEngine = HeaderEngine(args.http11, args.content_length, args.cache_control)
+
+    if args.header_table:
+        print('Warning: with --header-table, files do not include their headers. Stock lwIP',
+              'ignores fsdata_hdr_index, so a firmware header hook is needed to send them')
+
+    if args.watch:
+        watcher = FsWatcher(path, hdrEngine, args.gzip,
+                            lambda fsData: GenerateOutput(fsData, args, hdrEngine))
+        watcher.run(args.poll_interval, usePolling=args.poll)
+        exit()
+
+    profiler = BuildProfiler(args.profile or (args.report is not None), args.cprofile)
+    progress = ProgressPrinter(args.progress_interval)
+
+    print('Parsing files from:', path)
+    with profiler.stage('scan'):
+        fsData = GetFsData(path, hdrEngine, args.gzip, profiler, progress)
+
+    #Notify the user of progress
+    if args.binary is None:
+        print('Generating output file', args.output)
+    else:
+        print('Generating output files', args.output, 'and', args.binary)
+    GenerateOutput(fsData, args, hdrEngine, profiler)
+
+    if args.profile:
+        profiler.printSummary()
+    if args.report is not None:
+        profiler.writeJson(args.report)
+    profiler.writeCProfile()
@@ -9,9 +9,13 @@
 # Use of the software is subject to the terms and conditions of the
 # Clear BSD License ( https://spdx.org/licenses/BSD-3-Clause-Clear.html ).
 ###
-import serial
+import os
+import sys
 from serial.tools import list_ports as ports
-import time
+
+#Shared transport layer lives in the SerialTransport folder of this repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'SerialTransport'))
+from serialTransport import serialTransport, SerialProtocolError
 
 class MAXPICO2PMB:
     '''
@@ -21,13 +25,14 @@ class MAXPICO2PMB:
                   cleared when finished to correctly close out the serial port
     '''
     #Initializes the class instance
-    def __init__(self, explicitPort = None):
+    def __init__(self, explicitPort = None, retry = None):
         '''
         Class constructors.  Automatically searches for a MAXPICO2PMB device
         among all of the comm ports.  If explicitPort is passed, only that port
         will be checked
 
         explicitPort - Force a specific COM port
+        retry - retryPolicy for transactions. Default is no retries
         '''
         self.__portConn = None
 
@@ -37,25 +42,30 @@ class MAXPICO2PMB:
             availPorts = [explicitPort]
 
         for port in availPorts:
+            s = None
             try:
-                s = serial.Serial(port, 115200, timeout=1.0)
-                #Sleep a tick, then flush the read just in case anything lingering
-                time.sleep(0.5)
-                s.read_all()
-
-                #Use the G 2 command to get the Version string
-                s.write(b'G 2\r\n')
-                id_str = str(s.readline(), 'utf-8')
-
-                if(id_str.startswith('MAXPICO2PMB')):
+                s = serialTransport(port, 115200, retry=retry)
+                #Flush anything lingering, once the device goes quiet
+                s.drain()
+
+                #Use the G 2 command to get the Version string. Poll until it
+                #responds, rather than a fixed wait
+                id_str = s.waitReady(b'G 2\r\n', lambda line: line.startswith(b'MAXPICO2PMB'),
+                                     timeout=2.0)
+
+                if id_str is not None:
+                    #Toss any late replies to the earlier polls
+                    s.drain()
                     self.__portConn = s
-                    self.__versionStr = id_str.strip()
+                    self.__versionStr = str(id_str, 'utf-8').strip()
                     print('Port {} appears to be a MAXPICO2PMB'.format(s.name))
                     return
                 else:
                     s.close()
             except:
                 print('Error working with {}'.format(port))
+                if s is not None:
+                    s.close()
 
         print('Did not find a MAXPICO2PMB')
 
@@ -89,6 +99,26 @@ class MAXPICO2PMB:
         return self.__versionStr
 
 
+    #Gets the latency statistics of the port
+    def getLatencyStats(self):
+        '''
+        Returns the transaction latency statistics of the COM port
+
+        Outputs
+            Dictionary of counts and latencies in seconds. See latencyStats
+        '''
+        return self.__portConn.stats.summary()
+
+
+    #Discards any reply left on the port
+    def resync(self):
+        '''
+        Discards received data until the device goes quiet, so a late reply
+        from a failed command isn't read as the reply to the next one
+        '''
+        self.__portConn.drain(quiet=self.__portConn.turnaround)
+
+
     #Writes a single device register
     def writeRegister(self, busAddr, regAddr, value):
         '''
@@ -121,10 +151,14 @@ class MAXPICO2PMB:
             ctrlStr += '{:02X}'.format(v)
         ctrlStr += '\r\n'
 
-        self.__portConn.write(ctrlStr.encode('utf-8'))
-        result = str(self.__portConn.readline(), 'utf-8')
-        if( not result.startswith('ack')):
-            raise Exception('Bus Nack Exception')
+        def transact():
+            #Reply is a single ack or nack line
+            deadline = self.__portConn.write(ctrlStr.encode('utf-8'), len('nack\r\n'))
+            result = str(self.__portConn.readLine(deadline), 'utf-8')
+            if( not result.startswith('ack')):
+                raise SerialProtocolError('Bus Nack Exception')
+
+        self.__portConn.transaction(transact)
 
 
     #Reads a single device register
@@ -159,16 +193,22 @@ class MAXPICO2PMB:
 
         #Device wants 8-bit I2C address with LSB 0
         ctrlStr = 'r {:02X} {:02X} {:02X}\r\n'.format(busAddr << 1, regAddr, count)
-        self.__portConn.write(ctrlStr.encode('utf-8'))
-
-        values = []
-        for i in range(count):
-            result = str(self.__portConn.readline(), 'utf-8')
-            if result.startswith('nack'):
-                raise Exception('Bus Nack Exception')
-            else:
-                values.append(int(result, 16))
-        return values
+
+        def transact():
+            #Reply is a line per register, 2 hex digits each
+            deadline = self.__portConn.write(ctrlStr.encode('utf-8'), 4*count)
+            values = []
+            for i in range(count):
+                result = str(self.__portConn.readLine(deadline), 'utf-8')
+                if result.startswith('nack'):
+                    raise SerialProtocolError('Bus Nack Exception')
+                try:
+                    values.append(int(result, 16))
+                except ValueError:
+                    raise SerialProtocolError('Invalid register value {}'.format(result.strip()))
+            return values
+
+        return self.__portConn.transaction(transact)
 
 
 #Simple catch for running directly.  Looks for a device then exits
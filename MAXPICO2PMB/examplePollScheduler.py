@@ -0,0 +1,61 @@
+###
+# Copyright © 2024 by Analog Devices, Inc.  All rights reserved.
+#
+# This software is proprietary to Analog Devices, Inc. and its licensors.
+#
+# This software is provided on an “as is” basis without any representations,
+# warranties, guarantees or liability of any kind.
+#
+# Use of the software is subject to the terms and conditions of the
+# Clear BSD License ( https://spdx.org/licenses/BSD-3-Clause-Clear.html ).
+###
+from MAXPICO2PMB import MAXPICO2PMB
+from pollScheduler import pollScheduler, pollSpec
+
+#ADXL345 Device Constants
+ADXL345_ADDR    = 0x1D
+REG_PWRCTRL     = 0x2D
+REG_DATAFMT     = 0x31
+REG_DATAX0      = 0x32
+REG_DATAY0      = 0x34
+
+
+#Entry point for the test script
+if __name__ == '__main__':
+    #Find the MAXPICO2PMB
+    print('Looking for a MAXPICO2PMB')
+    iface = MAXPICO2PMB()
+    if iface.isConnected():
+        print('Success!')
+    else:
+        print('Failed to find MAXPICO2PMB')
+        exit()
+
+    #Enable measurement mode, 2g Range, 10-bit mode
+    iface.writeRegister(ADXL345_ADDR, REG_PWRCTRL, 0x8)
+    iface.writeRegister(ADXL345_ADDR, REG_DATAFMT, 0x00)
+
+    #X at 50Hz, Y and Z at 20Hz. When both are due, they are read in a single
+    #burst. Add specs for other PMODs on the bus in the same way
+    sched = pollScheduler(iface, [
+                pollSpec('x', ADXL345_ADDR, REG_DATAX0, 2, 50),
+                pollSpec('yz', ADXL345_ADDR, REG_DATAY0, 4, 20)])
+    sched.run(5.0)
+
+    #Print the latest samples in G's. Data is signed 10-bit
+    for name in ['x', 'yz']:
+        stamp, values = sched.getBuffer(name)[-1]
+        accel = [int.from_bytes(values[i:i+2], 'little', signed=True) / 512 * 2
+                 for i in range(0, len(values), 2)]
+        print('{:s} @ {:.3f}: {}'.format(name, stamp, accel))
+
+    #Report the rates achieved against those requested
+    stats = sched.getStats()
+    for name, s in stats['specs'].items():
+        print('{:s}: {:.1f}Hz of {:.1f}Hz, {:d} missed, {:d} errors'.format(
+                name, s['achieved_hz'], s['requested_hz'], s['missed'], s['errors']))
+    print('Bus utilization {:.1f}%, {:d} bursts'.format(
+            100 * stats['bus_utilization'], stats['bursts']))
+
+    #Clean up the interface
+    del iface
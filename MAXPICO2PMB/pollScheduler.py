@@ -0,0 +1,250 @@
+###
+# Copyright © 2024 by Analog Devices, Inc.  All rights reserved.
+#
+# This software is proprietary to Analog Devices, Inc. and its licensors.
+#
+# This software is provided on an “as is” basis without any representations,
+# warranties, guarantees or liability of any kind.
+#
+# Use of the software is subject to the terms and conditions of the
+# Clear BSD License ( https://spdx.org/licenses/BSD-3-Clause-Clear.html ).
+###
+import collections
+import os
+import sys
+import time
+
+#Shared transport layer lives in the SerialTransport folder of this repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'SerialTransport'))
+from serialTransport import SerialTransportError
+
+#Largest register count a single read command supports
+MAX_BURST_COUNT = 0xFF
+
+
+class pollSpec:
+    '''
+    pollSpec - Describes a block of registers on an I2C device to poll at a
+               fixed rate. Samples are kept in a ring buffer
+    '''
+    def __init__(self, name, busAddr, regAddr, count, rate, bufferLen = 256):
+        '''
+        Inputs
+            name      - Unique name for the spec, used to look up results
+            busAddr   - 7-bit I2C Address
+            regAddr   - 1-byte address of the first register
+            count     - Number of registers in the block
+            rate      - Requested polls per second
+            bufferLen - Number of samples kept in the ring buffer
+        '''
+        if(count < 1) or (count > MAX_BURST_COUNT) or (regAddr + count > 0x100):
+            raise Exception('Invalid register block')
+        if(rate <= 0):
+            raise Exception('Rate must be positive')
+
+        self.name = name
+        self.busAddr = busAddr
+        self.regAddr = regAddr
+        self.count = count
+        self.rate = rate
+        self.period = 1.0 / rate
+
+        #Ring buffer of (timestamp, register values) tuples
+        self.buffer = collections.deque(maxlen = bufferLen)
+
+        #Scheduling state and statistics
+        self.nextDue = 0.0
+        self.lastServed = 0.0
+        self.samples = 0
+        self.missed = 0
+        self.errors = 0
+        self.lastError = None
+
+
+def MergeBlocks(specs, maxGap = 0):
+    '''
+    MergeBlocks - Merges the register blocks of specs on the same device into
+                  the fewest reads. Blocks which overlap, touch, or are within
+                  maxGap registers of each other are read together
+
+    Inputs
+        specs  - List of pollSpec on the same bus address
+        maxGap - Largest number of unrequested registers read to join two
+                 blocks. Keep 0 if reading registers has side effects
+
+    Outputs
+        List of (regAddr, count, specs) tuples, one per read
+    '''
+    bursts = []
+    for spec in sorted(specs, key = lambda s: s.regAddr):
+        end = spec.regAddr + spec.count
+        if bursts:
+            start, count, members = bursts[-1]
+            if((spec.regAddr <= start + count + maxGap) and
+               (max(end, start + count) - start <= MAX_BURST_COUNT)):
+                bursts[-1] = (start, max(end, start + count) - start, members + [spec])
+                continue
+        bursts.append((spec.regAddr, spec.count, [spec]))
+    return bursts
+
+
+class pollScheduler:
+    '''
+    pollScheduler - Polls several I2C devices sharing one MAXPICO2PMB, or
+                    similar interface with readRegisters. Specs are served
+                    earliest deadline first, so devices interleave fairly.
+                    Specs on the same device which are due together have their
+                    reads merged into the fewest bursts
+    '''
+    def __init__(self, iface, specs, mergeWindow = 0.25, maxGap = 0,
+                 catchErrors = (SerialTransportError,)):
+        '''
+        Inputs
+            iface       - Interface providing readRegisters(busAddr, regAddr,
+                          count), and optionally resync() to discard stale
+                          replies after a failed read
+            specs       - List of pollSpec. Names must be unique
+            mergeWindow - A spec due within this fraction of its period is
+                          read early, if it can join a read on the same device
+            maxGap      - See MergeBlocks
+            catchErrors - Tuple of the exception types counted as a failed
+                          poll. Others are raised to the caller
+        '''
+        if len(set(s.name for s in specs)) != len(specs):
+            raise Exception('Poll spec names must be unique')
+
+        self.__iface = iface
+        self.__specs = {s.name: s for s in specs}
+        self.mergeWindow = mergeWindow
+        self.maxGap = maxGap
+        self.catchErrors = catchErrors
+
+        self.__start = None
+        self.__busy = 0.0
+        self.bursts = 0
+        self.registersRead = 0
+
+
+    #Runs the scheduler for a period of time
+    def run(self, duration):
+        '''
+        Polls the devices until the duration has passed
+
+        Inputs
+            duration - Seconds to run for
+        '''
+        end = time.monotonic() + duration
+        while self.step(end):
+            pass
+
+
+    #Performs the next read
+    def step(self, until = None):
+        '''
+        Waits for the earliest due spec, then reads it along with the other
+        specs of that device which are due
+
+        Inputs
+            until - Don't wait past this time.monotonic() time. None for no
+                    limit
+
+        Outputs
+            True if a read was performed, False if until was reached first
+        '''
+        now = time.monotonic()
+        if self.__start is None:
+            self.__start = now
+            for spec in self.__specs.values():
+                spec.nextDue = now
+
+        #Earliest deadline first. Ties go to the least recently served
+        first = min(self.__specs.values(), key = lambda s: (s.nextDue, s.lastServed))
+        if (until is not None) and (first.nextDue > until):
+            time.sleep(max(0.0, until - now))
+            return False
+        if first.nextDue > now:
+            time.sleep(first.nextDue - now)
+            now = time.monotonic()
+
+        #Pull in the other specs of the device that are due, or nearly due
+        group = [s for s in self.__specs.values()
+                 if (s.busAddr == first.busAddr) and
+                    (s.nextDue - now <= self.mergeWindow * s.period)]
+
+        for regAddr, count, members in MergeBlocks(group, self.maxGap):
+            start = time.monotonic()
+            error = None
+            try:
+                values = self.__iface.readRegisters(first.busAddr, regAddr, count)
+            except self.catchErrors as e:
+                values = None
+                error = e
+                #Don't let a late reply be read as the next burst's values
+                if hasattr(self.__iface, 'resync'):
+                    self.__iface.resync()
+            done = time.monotonic()
+
+            self.__busy += done - start
+            self.bursts += 1
+            self.registersRead += count
+
+            #Time stamp at the middle of the read
+            stamp = (start + done) / 2
+            for spec in members:
+                if values is None:
+                    spec.errors += 1
+                    spec.lastError = error
+                else:
+                    offset = spec.regAddr - regAddr
+                    spec.buffer.append((stamp, values[offset:offset + spec.count]))
+                    spec.samples += 1
+
+        #Schedule the next polls. Polls a full period or more behind are
+        #skipped, not caught up, so a late device doesn't starve the others
+        now = time.monotonic()
+        for spec in group:
+            spec.lastServed = now
+            spec.nextDue += spec.period
+            behind = int((now - spec.nextDue) / spec.period)
+            if behind > 0:
+                spec.missed += behind
+                spec.nextDue += behind * spec.period
+        return True
+
+
+    #Gets the ring buffer of a spec
+    def getBuffer(self, name):
+        '''
+        Returns the ring buffer of samples for a spec
+
+        Inputs
+            name - Name of the spec
+
+        Outputs
+            deque of (timestamp, register values) tuples. Timestamps are
+            time.monotonic() seconds
+        '''
+        return self.__specs[name].buffer
+
+
+    #Gets the scheduler statistics
+    def getStats(self):
+        '''
+        Returns the achieved versus requested rate of each spec, and the bus
+        utilization since the first step
+
+        Outputs
+            Dictionary of the statistics
+        '''
+        elapsed = 0.0 if self.__start is None else (time.monotonic() - self.__start)
+        specs = {}
+        for name, spec in self.__specs.items():
+            specs[name] = {'requested_hz': spec.rate,
+                           'achieved_hz': (spec.samples / elapsed) if elapsed else 0.0,
+                           'samples': spec.samples, 'missed': spec.missed,
+                           'errors': spec.errors, 'last_error': spec.lastError}
+        return {'elapsed_s': elapsed,
+                'bus_utilization': (self.__busy / elapsed) if elapsed else 0.0,
+                'bursts': self.bursts,
+                'registers_read': self.registersRead,
+                'specs': specs}
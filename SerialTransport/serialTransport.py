@@ -0,0 +1,308 @@
+###
+# Copyright © 2024 by Analog Devices, Inc.  All rights reserved.
+#
+# This software is proprietary to Analog Devices, Inc. and its licensors.
+#
+# This software is provided on an “as is” basis without any representations,
+# warranties, guarantees or liability of any kind.
+#
+# Use of the software is subject to the terms and conditions of the
+# Clear BSD License ( https://spdx.org/licenses/BSD-3-Clause-Clear.html ).
+###
+import collections
+import serial
+import time
+
+
+class SerialTransportError(Exception):
+    '''
+    Base class for all errors raised by the serial transport
+    '''
+
+
+class SerialTimeoutError(SerialTransportError):
+    '''
+    Raised when a reply is not complete by its deadline
+    '''
+    def __init__(self, message, partial = b''):
+        '''
+        Inputs
+            message - Error description
+            partial - Bytes received before the deadline passed
+        '''
+        super().__init__(message)
+        self.partial = partial
+
+
+class SerialProtocolError(SerialTransportError):
+    '''
+    Raised when a reply is received, but is malformed or reports a failure
+    '''
+
+
+class retryPolicy:
+    '''
+    retryPolicy - Describes how a failed transaction is retried
+    '''
+    def __init__(self, attempts = 1, backoff = 0.0, retryOn = (SerialTimeoutError,)):
+        '''
+        Inputs
+            attempts - Total number of attempts. 1 disables retries
+            backoff  - Seconds to wait before each retry
+            retryOn  - Tuple of the exception types which are retried
+        '''
+        if attempts < 1:
+            raise Exception('Must allow at least 1 attempt')
+        self.attempts = attempts
+        self.backoff = backoff
+        self.retryOn = retryOn
+
+
+class latencyStats:
+    '''
+    latencyStats - Collects transaction latencies and error counts for a port.
+                   Percentiles are taken over a window of the latest samples
+    '''
+    def __init__(self, window = 1000):
+        '''
+        Inputs
+            window - Number of latest latency samples kept
+        '''
+        self.__samples = collections.deque(maxlen = window)
+        self.count = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.maxLatency = 0.0
+
+    def record(self, seconds):
+        '''
+        Records the latency of a successful transaction
+
+        Inputs
+            seconds - Transaction latency, including any retries
+        '''
+        self.__samples.append(seconds)
+        self.count += 1
+        self.maxLatency = max(self.maxLatency, seconds)
+
+    def recordError(self, error):
+        '''
+        Records a failed transaction attempt
+
+        Inputs
+            error - Exception raised by the attempt
+        '''
+        self.errors += 1
+        if isinstance(error, SerialTimeoutError):
+            self.timeouts += 1
+
+    def summary(self):
+        '''
+        Returns the statistics as a dictionary. Latencies are in seconds, and
+        None until a transaction completes
+
+        Outputs
+            Dictionary of count, errors, timeouts, retries, min, mean, p50,
+            p90, p99 and max
+        '''
+        result = {'count': self.count, 'errors': self.errors,
+                  'timeouts': self.timeouts, 'retries': self.retries,
+                  'min': None, 'mean': None, 'p50': None, 'p90': None,
+                  'p99': None, 'max': None}
+        if self.__samples:
+            samples = sorted(self.__samples)
+            pick = lambda p: samples[min(len(samples) - 1, int(p * len(samples)))]
+            result.update({'min': samples[0], 'mean': sum(samples) / len(samples),
+                           'p50': pick(0.50), 'p90': pick(0.90),
+                           'p99': pick(0.99), 'max': self.maxLatency})
+        return result
+
+
+class serialTransport:
+    '''
+    serialTransport - Serial port wrapper for command/reply style devices.
+                      Every read is bounded by a deadline derived from the size
+                      of the transaction and the baud rate, so a short or
+                      missing reply fails fast with a typed error instead of
+                      stalling on a fixed timeout
+    '''
+    #Bits on the wire per byte. 8N1
+    BITS_PER_BYTE = 10
+
+    def __init__(self, port, baudrate = 115200, turnaround = 0.05, margin = 2.0,
+                 retry = None, statsWindow = 1000):
+        '''
+        Opens the port
+
+        Inputs
+            port        - Serial port name, or a pyserial URL such as loop://
+            baudrate    - Baud rate
+            turnaround  - Seconds allowed for the device to process a command,
+                          on top of the time on the wire
+            margin      - Multiplier applied to the time on the wire
+            retry       - retryPolicy for transactions. Default is no retries
+            statsWindow - Number of latency samples kept for the statistics
+        '''
+        self.__conn = serial.serial_for_url(port, baudrate, timeout = turnaround)
+        self.name = self.__conn.name
+        self.baudrate = baudrate
+        self.turnaround = turnaround
+        self.margin = margin
+        self.retry = retryPolicy() if retry is None else retry
+        self.stats = latencyStats(statsWindow)
+
+    def close(self):
+        '''
+        Closes the port
+        '''
+        self.__conn.close()
+
+    def frameTime(self, numBytes):
+        '''
+        Returns the seconds to move the given number of bytes at the baud rate
+
+        Inputs
+            numBytes - Number of bytes
+        '''
+        return numBytes * self.BITS_PER_BYTE / self.baudrate
+
+    def deadline(self, txBytes, rxBytes):
+        '''
+        Returns the deadline for a transaction of the given size
+
+        Inputs
+            txBytes - Number of bytes sent
+            rxBytes - Number of bytes expected back
+
+        Outputs
+            Deadline, in time.monotonic() seconds
+        '''
+        return (time.monotonic() + self.turnaround +
+                self.margin * self.frameTime(txBytes + rxBytes))
+
+    def write(self, data, rxBytes = 0):
+        '''
+        Writes a command to the device
+
+        Inputs
+            data    - Bytes to send
+            rxBytes - Number of bytes expected in the reply
+
+        Outputs
+            Deadline for the reply, in time.monotonic() seconds
+        '''
+        self.__conn.write(data)
+        return self.deadline(len(data), rxBytes)
+
+    def read(self, count, deadline):
+        '''
+        Reads exactly count bytes
+
+        Inputs
+            count    - Number of bytes to read
+            deadline - Deadline, in time.monotonic() seconds
+
+        Outputs
+            Bytes read
+        '''
+        self.__setTimeout(deadline)
+        data = self.__conn.read(count)
+        if len(data) < count:
+            raise SerialTimeoutError('Read {} of {} bytes on {}'.format(
+                                        len(data), count, self.name), data)
+        return data
+
+    def readLine(self, deadline, terminator = b'\n'):
+        '''
+        Reads a line
+
+        Inputs
+            deadline   - Deadline, in time.monotonic() seconds
+            terminator - Line terminator
+
+        Outputs
+            Bytes read, including the terminator
+        '''
+        self.__setTimeout(deadline)
+        data = self.__conn.read_until(terminator)
+        if not data.endswith(terminator):
+            raise SerialTimeoutError('Incomplete line on {}'.format(self.name), data)
+        return data
+
+    def drain(self, quiet = 0.05, timeout = 1.0):
+        '''
+        Discards received data until the device has been quiet for a while
+
+        Inputs
+            quiet   - Seconds without data considered quiet
+            timeout - Maximum seconds to spend draining
+        '''
+        end = time.monotonic() + timeout
+        while True:
+            self.__setTimeout(min(time.monotonic() + quiet, end))
+            if not self.__conn.read(max(1, self.__conn.in_waiting)):
+                return
+            if time.monotonic() >= end:
+                return
+
+    def waitReady(self, probe, isReady, timeout, interval = 0.25):
+        '''
+        Polls the device with a probe command until its reply is accepted.
+        Used in place of fixed sleeps while a device starts up
+
+        Inputs
+            probe    - Bytes to send
+            isReady  - Function taking the reply line, returns True if ready
+            timeout  - Maximum seconds to wait
+            interval - Maximum seconds to wait for each reply
+
+        Outputs
+            Accepted reply line, or None if the timeout passed
+        '''
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            self.__conn.write(probe)
+            try:
+                line = self.readLine(min(time.monotonic() + interval, end))
+                if isReady(line):
+                    return line
+            except SerialTimeoutError:
+                pass
+        return None
+
+    def transaction(self, func):
+        '''
+        Runs a command/reply transaction using the retry policy. After a
+        failed attempt, input is drained until the device goes quiet, before
+        retrying or raising, so a late reply isn't taken as the reply to the
+        next command. The latency of successful transactions is recorded in
+        stats
+
+        Inputs
+            func - Function performing the transaction with write and the read
+                   methods. Returns the transaction result
+
+        Outputs
+            Result of func
+        '''
+        start = time.monotonic()
+        for attempt in range(self.retry.attempts):
+            try:
+                result = func()
+                self.stats.record(time.monotonic() - start)
+                return result
+            except SerialTransportError as e:
+                self.stats.recordError(e)
+                #Late replies arrive after the deadline, so wait for quiet
+                #rather than only flushing what has already been received
+                self.drain(quiet = self.turnaround)
+                if (attempt + 1 >= self.retry.attempts) or not isinstance(e, self.retry.retryOn):
+                    raise
+            self.stats.retries += 1
+            if self.retry.backoff > 0:
+                time.sleep(self.retry.backoff)
+
+    def __setTimeout(self, deadline):
+        #pyserial applies the timeout to the whole read call
+        self.__conn.timeout = max(0.0, deadline - time.monotonic())